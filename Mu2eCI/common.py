@@ -1,7 +1,8 @@
 import os
 import json
+import functools
 from datetime import datetime
-from time import sleep, gmtime
+from time import sleep, gmtime, monotonic
 from calendar import timegm
 from urllib.request import urlopen
 
@@ -9,14 +10,46 @@ from Mu2eCI import config
 from Mu2eCI import test_suites
 from Mu2eCI.logger import log
 
+# org membership, team members and branch heads change on the order of
+# minutes, so lookups of these are reused for this many seconds
+GITHUB_CACHE_TTL = 300
 
+# the build queue size is only informational, so don't wait long for it,
+# and reuse it for the PRs processed in quick succession after a merge
+JENKINS_API_TIMEOUT = 15
+BUILD_QUEUE_CACHE_TTL = 15
+
+
+def ttl_cache(seconds, key):
+    # memoise a function's return value for a limited time.
+    # key(*args, **kwargs) gives the cache key for a call - GitHub objects
+    # don't compare by value, so this should be built from e.g. their names.
+    def decorator(func):
+        cache = {}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs)
+            now = monotonic()
+            if k in cache and now - cache[k][0] < seconds:
+                return cache[k][1]
+            value = func(*args, **kwargs)
+            cache[k] = (now, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+@ttl_cache(BUILD_QUEUE_CACHE_TTL, key=lambda: ())
 def get_build_queue_size():
     jenkins_url = "https://buildmaster.fnal.gov/buildmaster/queue/api/json?pretty=true"
 
     bqsize = "- API unavailable"
 
     try:
-        contents = json.load(urlopen(jenkins_url))
+        contents = json.load(urlopen(jenkins_url, timeout=JENKINS_API_TIMEOUT))
         nitems = len(contents["items"])
         bqsize = "is empty"
         if nitems > 0:
@@ -83,31 +116,30 @@ def check_test_cmd_mu2e(full_comment, repository):
     # desc: integration build tests -> mu2e/buildtest -> [jenkins project name]
     # desC: physics validation -> mu2e/validation -> [jenkins project name]
     log.debug("Matching regular expressions to this comment.")
-    try:
-        log.debug(repr(full_comment))
-    except Exception:
-        log.exception("could not print comment...")
+    log.debug("%r", full_comment)
+
+    # every trigger statement starts by mentioning the bot, so most
+    # comments can be ruled out with this one search
+    if test_suites.regex_mentioned.search(full_comment) is None:
+        log.debug("NO MATCHES")
+        return None, False
 
     for regex, handler in test_suites.TESTS:
         # returns the first match in the comment
         match = regex.search(full_comment)
         if match is None:
-            log.debug("NOT MATCHED - %s", str(regex.pattern))
+            log.debug("NOT MATCHED - %s", regex.pattern)
             continue
         handle = handler(match)
 
         if handle is None:
-            log.debug("MATCHED - BUT NoneType HANDLE RETURNED - %s", str(regex.pattern))
+            log.debug("MATCHED - BUT NoneType HANDLE RETURNED - %s", regex.pattern)
             continue
-        log.debug("MATCHED - %s", str(regex.pattern))
+        log.debug("MATCHED - %s", regex.pattern)
         return handle, True
 
-    if test_suites.regex_mentioned.search(full_comment) is not None:
-        log.debug("MATCHED - but unrecognised command")
-        return None, True
-    log.debug("NO MATCHES")
-
-    return None, False
+    log.debug("MATCHED - but unrecognised command")
+    return None, True
 
 
 def create_properties_file_for_test(
@@ -145,18 +177,57 @@ def create_properties_file_for_test(
 
 
 def get_modified(modified_files):
-    modified_top_level_folders = []
+    modified_top_level_folders = set()
     for f in modified_files:
         filename, file_extension = os.path.splitext(f.filename)
         log.debug("Changed file (%s): %s%s", file_extension, filename, file_extension)
 
-        splits = filename.split("/")
+        splits = filename.split("/", 1)
         if len(splits) > 1:
-            modified_top_level_folders.append(splits[0])
+            modified_top_level_folders.add(splits[0])
         else:
-            modified_top_level_folders.append("/")
+            modified_top_level_folders.add("/")
+
+    return modified_top_level_folders
 
-    return set(modified_top_level_folders)
+
+@ttl_cache(GITHUB_CACHE_TTL, key=lambda gh, login: login)
+def get_organization(gh, login):
+    return gh.get_organization(login)
+
+
+@ttl_cache(GITHUB_CACHE_TTL, key=lambda org, user: (org.login, user.login))
+def is_org_member(org, user):
+    return org.has_in_members(user)
+
+
+@ttl_cache(GITHUB_CACHE_TTL, key=lambda org, team_slug: (org.login, team_slug))
+def get_team_members(org, team_slug):
+    return frozenset(mem.login for mem in org.get_team_by_slug(team_slug).get_members())
+
+
+@ttl_cache(GITHUB_CACHE_TTL, key=lambda repo, branch: (repo.full_name, branch))
+def get_branch_sha(repo, branch):
+    return repo.get_branch(branch=branch).commit.sha
+
+
+# labels are shared by every PR in a repository, so each one only needs its
+# colour checked once per process: {(repo full name, label name)}
+_LABEL_COLOURS_CHECKED = set()
+
+
+def ensure_label_colours(repo, labels, colour_rules):
+    # colour_rules: (label name substring, colour) pairs, first match wins
+    for label in labels:
+        key = (repo.full_name, label.name)
+        if key in _LABEL_COLOURS_CHECKED:
+            continue
+        if label.color == "ededed":
+            # the label color isn't set
+            col = next((c for needle, c in colour_rules if needle in label.name), None)
+            if col not in (None, label.color):
+                label.edit(label.name, col)
+        _LABEL_COLOURS_CHECKED.add(key)
 
 
 def get_authorised_users(mu2eorg, repo, branch="all"):
@@ -170,18 +241,23 @@ def get_authorised_users(mu2eorg, repo, branch="all"):
     log.info("Authorised Teams: %s", ", ".join(authed_teams))
 
     for team_slug in authed_teams:
-        teamobj = mu2eorg.get_team_by_slug(team_slug)
-        authed_users += [mem.login for mem in teamobj.get_members()]
+        authed_users += get_team_members(mu2eorg, team_slug)
 
     # users authorised to communicate with this bot
     return set(authed_users), authed_teams
 
 
 def post_on_pr(issue, comment, previous_bot_comments):
-    if comment in previous_bot_comments:
+    # previous_bot_comments: the (stripped) bodies of the bot's comments on
+    # this PR, oldest first. only the newest is compared against, since some
+    # messages are legitimately repeated (e.g. re-triggering a failed test).
+    # GitHub may not keep trailing whitespace, so compare stripped.
+    body = comment.strip()
+    if previous_bot_comments and previous_bot_comments[-1] == body:
         log.warning(
             "SPAM PROTECTION - We are posting something we already "
             "posted before! Something is wrong!"
         )
         return
     issue.create_comment(comment)
+    previous_bot_comments.append(body)
@@ -1,6 +1,5 @@
 import re
 from datetime import datetime
-from socket import setdefaulttimeout
 
 from Mu2eCI import config
 from Mu2eCI import test_suites
@@ -10,8 +9,12 @@ from Mu2eCI.common import (
     post_on_pr,
     get_modified,
     get_authorised_users,
+    get_organization,
+    get_branch_sha,
+    is_org_member,
     check_test_cmd_mu2e,
     create_properties_file_for_test,
+    ensure_label_colours,
     get_build_queue_size,
 )
 from Mu2eCI.messages import (
@@ -23,14 +26,169 @@ from Mu2eCI.messages import (
     BASE_BRANCH_HEAD_CHANGED,
 )
 
-setdefaulttimeout(300)
 
+# label colours, by a substring of the label name
+LABEL_COLOUR_RULES = tuple(config.main["labels"]["colors"].items())
+
+# description of the mu2e/buildtest/last status, followed by the base branch
+# commit SHA that the build test was last triggered against
+LAST_TEST_DESCRIPTION = "Last test triggered against "
+
+# description of the status set when a test is triggered. The status is
+# always posted, even if identical, since its time starts the stall clock.
+TRIGGERED_DESCRIPTION = "The test has been triggered in Jenkins"
+
+# the commit statuses we set for a test, less the target URL and context
+STATUS_TRIGGERED = {"state": "pending", "description": TRIGGERED_DESCRIPTION}
+STATUS_STALLED = {
+    "state": "error",
+    "description": "The job has stalled on Jenkins. It can be re-triggered.",
+}
+STATUS_NOT_TRIGGERED = {
+    "state": "pending",
+    "description": "This test has not been triggered yet.",
+}
+
+# test states in which a test has finished, and can be triggered again
+TERMINAL_STATES = frozenset({"failed", "error", "success", "finished"})
+# test states in which a triggered test is still waiting on Jenkins
+IN_PROGRESS_STATES = frozenset({"running", "pending"})
+# build test states that are reset when we don't know which base branch
+# commit the build was tested against
+BUILD_RESET_STATES = frozenset({"success", "finished", "error", "failure"})
+# commit status API states only set once a test has been triggered and run
+COMPLETED_STATUS_STATES = frozenset({"success", "failure"})
+
+# watched packages that are plain folder names, rather than regexes
+LITERAL_PACKAGE = re.compile(r"[A-Za-z0-9_/]+")
+
+
+def _compile_watched_package(pkgpatt):
+    # the compiled pattern, and whether it can be joined with others
+    if not isinstance(pkgpatt, str):
+        raise TypeError("not a string")
+    try:
+        # compiled as it would appear in an alternation
+        regex_comp = re.compile("(?:%s)" % pkgpatt, re.I)
+    except re.error:
+        # some patterns only work on their own, e.g. ones that start with
+        # global flags like (?i)
+        return re.compile(pkgpatt, re.I), False
+    # joining would renumber its groups (e.g. for backreferences)
+    return regex_comp, not regex_comp.groups
+
+
+def _compile_user_watchers(user, packages):
+    # a tuple of plain folder name prefixes and a tuple of case-insensitive
+    # regexes. where possible, the regexes are joined into one alternation,
+    # so that each modified folder is checked in a couple of calls
+    literals = []
+    joinable = []
+    regexes = []
+    for pkgpatt in packages:
+        try:
+            regex_comp, can_join = _compile_watched_package(pkgpatt)
+        except Exception:
+            log.warning(
+                "ERROR: Possibly bad regex for watching user %s: %s" % (user, pkgpatt)
+            )
+            continue
+        if LITERAL_PACKAGE.fullmatch(pkgpatt):
+            literals.append(pkgpatt.lower())
+        elif can_join:
+            joinable.append(regex_comp)
+        else:
+            regexes.append(regex_comp)
+    if len(joinable) > 1:
+        try:
+            joinable = [re.compile("|".join(r.pattern for r in joinable), re.I)]
+        except Exception:
+            log.warning(
+                "Could not combine the regexes for watching user %s, "
+                "they will be checked one by one",
+                user,
+            )
+    return tuple(literals), tuple(joinable + regexes)
+
+
+def _compile_watchers(watchers):
+    compiled = {}
+    for user, packages in watchers.items():
+        # a bad entry for one user shouldn't affect anyone else
+        try:
+            watched = _compile_user_watchers(user, packages)
+        except Exception:
+            log.exception(
+                "There was a problem while reading the watched packages of %s", user
+            )
+            continue
+        if any(watched):
+            compiled[user] = watched
+    return compiled
+
+
+def _is_watching(watched, target):
+    literals, regexes = watched
+    return target.startswith(literals) or any(
+        regex_comp.match(target) is not None for regex_comp in regexes
+    )
+
+
+try:
+    WATCHERS = _compile_watchers(config.watchers)
+except Exception:
+    log.exception("There was a problem while trying to build the watcher list...")
+    WATCHERS = {}
+
+
+class TestState:
+    # the state of one test on the latest commit of a PR
+    __slots__ = ("status", "triggered", "exists", "url", "updated_at")
 
-def process_pr(gh, repo, issue, dryRun=False, child_call=0):
-    if child_call > 2:
-        log.warning("Stopping recursion")
+    def __init__(self, status="pending"):
+        self.status = status
+        self.triggered = False
+        # did we already create a commit status?
+        self.exists = False
+        # where the test is running, if it is
+        self.url = None
+        # when the commit status was last updated
+        self.updated_at = None
+
+    def reset(self, status="pending"):
+        # forget about the last run, so that the test may be triggered again
+        self.status = status
+        self.triggered = False
+        self.exists = False
+
+
+def process_pr(gh, repo, issue, dryRun=False):
+    base_ref = _process_pr(gh, repo, issue, dryRun)
+    if base_ref is None:
         return
+
+    # Let people know on other PRs that (since this one was merged) the
+    # base ref HEAD will have changed. Each of these PRs is open, so
+    # none of them can ask for another check in turn.
+    pulls_to_check = repo.get_pulls(state="open", base=base_ref)
+    for pr_ in pulls_to_check:
+        # one PR failing shouldn't stop the others from being checked
+        try:
+            _process_pr(gh, repo, pr_.as_issue(), dryRun)
+        except Exception:
+            log.exception(
+                "Failed to process PR #%d after a merge into %s",
+                pr_.number,
+                base_ref,
+            )
+
+
+def _process_pr(gh, repo, issue, dryRun):
+    # returns the base ref of the PR if it has just been merged,
+    # and all other open PRs against it should now be checked
     api_rate_limits(gh)
+    # one timestamp for every time comparison made on this PR
+    now = datetime.utcnow()
 
     if not issue.pull_request:
         log.warning("Ignoring: Not a PR")
@@ -52,29 +210,19 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
         # Note: If the Jenkins queue is inundated, then it's likely this won't
         # work at the time. But, this is not likely to be more than just an intermittent problem.
         # This allows for a 2 minute lag.
-        if (datetime.utcnow() - pr.merged_at).total_seconds() < 120:
-            # Let people know on other PRs that (since this one was merged) the
-            # base ref HEAD will have changed
+        if (now - pr.merged_at).total_seconds() < 120:
             log.info(
                 "Triggering check on all other open PRs as "
                 "this PR was merged within the last 2 minutes."
             )
-            pulls_to_check = repo.get_pulls(state="open", base=pr.base.ref)
-            for pr_ in pulls_to_check:
-                process_pr(
-                    gh,
-                    repo,
-                    pr_.as_issue(),
-                    dryRun,
-                    child_call=child_call + 1,
-                )
+            return pr.base.ref
 
     if pr.state == "closed":
         log.info("Ignoring: PR in closed state")
         return
 
-    mu2eorg = gh.get_organization("Mu2e")
-    trusted_user = mu2eorg.has_in_members(issue.user)
+    mu2eorg = get_organization(gh, "Mu2e")
+    trusted_user = is_org_member(mu2eorg, issue.user)
 
     authorised_users, authed_teams = get_authorised_users(
         mu2eorg, repo, branch=pr.base.ref
@@ -90,17 +238,16 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
     last_time_seen = None
     labels = set()
 
-    # commit test states:
-    test_statuses = {}
-    test_triggered = {}
-
-    # did we already create a commit status?
-    test_status_exists = {}
+    # commit test states, by test name:
+    test_states = {}
 
-    # tests we'd like to trigger on this commit
-    tests_to_trigger = []
+    # tests we'd like to trigger on this commit, and the extra
+    # environment for their jobs
+    tests_to_trigger = {}
     # tests we've already triggered
     tests_already_triggered = []
+    # did a new comment ask for tests?
+    trigger_comment_handled = False
 
     # get PR changed libraries / packages
     pr_files = pr.get_files()
@@ -109,39 +256,24 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
     # that have been edited by this PR
     modified_top_level_folders = get_modified(pr_files)
     log.debug("Build Targets changed:")
-    log.debug("\n".join(["- %s" % s for s in modified_top_level_folders]))
-
-    watchers = config.watchers
+    log.debug("\n".join("- %s" % s for s in modified_top_level_folders))
 
     # Figure out who is watching the modified packages and notify them
-    log.debug("watchers: %s", ", ".join(watchers))
+    log.debug("watchers: %s", ", ".join(WATCHERS))
     watcher_text = ""
-    watcher_list = []
+    watcher_list = set()
     try:
-        modified_targs = [x.lower() for x in modified_top_level_folders]
-        for user, packages in watchers.items():
-            for pkgpatt in packages:
-                try:
-                    regex_comp = re.compile(pkgpatt, re.I)
-                    for target in modified_targs:
-                        if (target == "/" and pkgpatt == "/") or regex_comp.match(
-                            target.strip()
-                        ):
-                            watcher_list.append(user)
-                            break
-                except Exception:
-                    log.warning(
-                        "ERROR: Possibly bad regex for watching user %s: %s"
-                        % (user, pkgpatt)
-                    )
+        modified_targs = [x.strip().lower() for x in modified_top_level_folders]
+        for user, watched in WATCHERS.items():
+            if any(_is_watching(watched, target) for target in modified_targs):
+                watcher_list.add(user)
 
-        watcher_list = set(watcher_list)
         if len(watcher_list) > 0:
             watcher_text = (
                 "The following users requested to be notified about "
                 "changes to these packages:\n"
             )
-            watcher_text += ", ".join(["@%s" % x for x in watcher_list])
+            watcher_text += ", ".join("@%s" % x for x in watcher_list)
     except Exception:
         log.exception("There was a problem while trying to build the watcher list...")
 
@@ -151,18 +283,15 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
 
     # set their status to 'pending' (will be updated shortly after)
     for test in test_requirements:
-        test_statuses[test] = "pending"
-        test_triggered[test] = False
-        test_status_exists[test] = False
+        test_states[test] = TestState()
 
     # this will be the commit of master that the PR is merged
     # into for the CI tests (for a build test this is just the current HEAD.)
-    master_commit_sha = repo.get_branch(
-        branch=pr.base.ref
-    ).commit.sha  # repo.get_branch("master").commit.sha
+    master_commit_sha = get_branch_sha(repo, pr.base.ref)
 
-    # get latest commit
-    last_commit = pr.get_commits().reversed[0]
+    # get latest commit - the PR head is already known, so fetch it
+    # directly instead of paging to the end of the PR's commit list
+    last_commit = repo.get_commit(pr.head.sha)
     git_commit = last_commit.commit
     if git_commit is None:
         return
@@ -178,12 +307,12 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
     log.info("Latest commit sha: %s", git_commit.sha)
     log.info("Merging into: %s %s", pr.base.ref, master_commit_sha)
     log.info("PR update time %s", pr.updated_at)
-    log.info("Time UTC: %s", datetime.utcnow())
+    log.info("Time UTC: %s", now)
 
     future_commit = False
     future_commit_timedelta_string = None
-    if last_commit_date > datetime.utcnow():
-        future_td = last_commit_date - datetime.utcnow()
+    if last_commit_date > now:
+        future_td = last_commit_date - now
         if future_td.total_seconds() > 120:
             future_commit = True
             future_commit_timedelta_string = str(future_td) + " (hh:mm:ss)"
@@ -191,46 +320,52 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
 
     # now get commit statuses
     # this is how we figure out the current state of tests
-    # on the latest commit of the PR.
-    commit_status = last_commit.get_statuses()
+    # on the latest commit of the PR. The combined status holds just the
+    # latest status for each context, in one request, rather than every
+    # status ever posted to the commit.
+    commit_status = last_commit.get_combined_status().statuses
+    current_statuses = {
+        stat.context: (stat.state, stat.description, stat.target_url)
+        for stat in commit_status
+    }
 
     # we can translate git commit status API 'state' strings if needed.
     state_labels = config.main["labels"]["states"]
 
-    state_labels_colors = config.main["labels"]["colors"]
-
-    commit_status_time = {}
-    test_urls = {}
     base_branch_HEAD_changed = False
     master_commit_sha_last_test = None
     stalled_job_info = ""
     legit_tests = set()
 
-    for stat in commit_status:
+    # only the most recent status for each test matters, and a test may
+    # have more than one context, so sort them oldest first and let newer
+    # statuses replace older ones
+    latest_statuses = {}
+    for stat in sorted(commit_status, key=lambda stat: stat.updated_at):
+        if "buildtest/last" in stat.context:
+            latest_statuses["buildtest/last"] = stat
+            continue
         name = test_suites.get_test_name(stat.context)
+        if name == "unrecognised":
+            continue
+        latest_statuses[name] = stat
+
+    for name, stat in latest_statuses.items():
         log.debug(f"Processing commit status: {stat.context}")
-        if "buildtest/last" in stat.context:
+        if name == "buildtest/last":
             log.debug("Check if this is when we last triggered the test.")
-            name = "buildtest/last"
-            if (
-                name in commit_status_time
-                and commit_status_time[name] > stat.updated_at
-            ):
-                continue
-            commit_status_time[name] = stat.updated_at
             # this is the commit SHA in master that we used in the last build test
-            master_commit_sha_last_test = stat.description.replace(
-                "Last test triggered against ", ""
-            )
+            description = stat.description
+            if description.startswith(LAST_TEST_DESCRIPTION):
+                description = description[len(LAST_TEST_DESCRIPTION) :]
+            master_commit_sha_last_test = description.strip()
 
             log.info(
                 "Last build test was run at base sha: %r, current HEAD is %r"
                 % (master_commit_sha_last_test, master_commit_sha)
             )
 
-            if not master_commit_sha.strip().startswith(
-                master_commit_sha_last_test.strip()
-            ):
+            if not master_commit_sha.startswith(master_commit_sha_last_test):
                 log.info(
                     "HEAD of base branch is now different to last tested base branch commit"
                 )
@@ -238,51 +373,41 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
             else:
                 log.info("HEAD of base branch is a match.")
             continue
-        if name == "unrecognised":
-            continue
 
-        if name in commit_status_time and commit_status_time[name] > stat.updated_at:
-            continue
-
-        commit_status_time[name] = stat.updated_at
+        test_state = test_states.setdefault(name, TestState())
+        test_state.updated_at = stat.updated_at
 
         # error, failure, pending, success
-        test_statuses[name] = stat.state
+        test_state.status = stat.state
         if stat.state in state_labels:
-            test_statuses[name] = state_labels[stat.state]
+            test_state.status = state_labels[stat.state]
         legit_tests.add(name)
-        test_status_exists[name] = True
-        if (
-            name in test_triggered and test_triggered[name]
-        ):  # if already True, don't change it
-            continue
+        test_state.exists = True
 
-        test_triggered[name] = (
+        test_state.triggered = (
             ("has been triggered" in stat.description)
-            or (stat.state in ["success", "failure"])
+            or (stat.state in COMPLETED_STATUS_STATES)
             or ("running" in stat.description)
         )
 
         # some other labels, gleaned from the description (the status API
         # doesn't support these states)
         if "running" in stat.description:
-            test_statuses[name] = "running"
-            test_urls[name] = str(stat.target_url)
+            test_state.status = "running"
+            test_state.url = str(stat.target_url)
         if "stalled" in stat.description:
-            test_statuses[name] = "stalled"
+            test_state.status = "stalled"
 
     if (
         (master_commit_sha_last_test is None or base_branch_HEAD_changed)
-        and "build" in test_statuses
-        and not test_statuses["build"] == "pending"
+        and "build" in test_states
+        and not test_states["build"].status == "pending"
     ):
         log.info(
             "The base branch HEAD has changed or we didn't know the base branch of the last test."
             " We need to reset the status of the build test and notify."
         )
-        test_triggered["build"] = False
-        test_statuses["build"] = "pending"
-        test_status_exists["build"] = False
+        test_states["build"].reset()
     elif base_branch_HEAD_changed:
         log.info(
             "The build test status is not present or has already been reset. "
@@ -291,45 +416,29 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
         base_branch_HEAD_changed = False
 
     # check if we've stalled
-    tests_ = test_statuses.keys()
     stalled_jobs = []
-    for name in tests_:
-        if name not in legit_tests:
-            continue
+    # only tests with a status on this commit can have stalled
+    for name in sorted(legit_tests):
+        test_state = test_states[name]
         log.info("Checking if %s has stalled...", name)
-        log.info("Status is %s", test_statuses[name])
-        if (
-            (test_statuses[name] in ["running", "pending"])
-            and (name in test_triggered)
-            and test_triggered[name]
-        ):
-            test_runtime = (
-                datetime.utcnow() - commit_status_time[name]
-            ).total_seconds()
+        log.info("Status is %s", test_state.status)
+        if (test_state.status in IN_PROGRESS_STATES) and test_state.triggered:
+            test_runtime = (now - test_state.updated_at).total_seconds()
             log.info("  Has been running for %d seconds", test_runtime)
             if test_runtime > test_suites.get_stall_time(name):
                 log.info("  The test has stalled.")
-                test_triggered[name] = False  # the test may be triggered again.
-                test_statuses[name] = "stalled"
-                test_status_exists[name] = False
+                test_state.reset("stalled")  # the test may be triggered again.
                 stalled_jobs += [name]
-                if name in test_urls:
+                if test_state.url is not None:
                     stalled_job_info += "\n- %s ([more info](%s))" % (
                         name,
-                        test_urls[name],
+                        test_state.url,
                     )
             else:
                 log.info("  The test has not stalled yet...")
     if "build" in legit_tests and master_commit_sha_last_test is None:
-        if "build" in test_statuses and test_statuses["build"] in [
-            "success",
-            "finished",
-            "error",
-            "failure",
-        ]:
-            test_triggered["build"] = False
-            test_statuses["build"] = "pending"
-            test_status_exists["build"] = False
+        if "build" in test_states and test_states["build"].status in BUILD_RESET_STATES:
+            test_states["build"].reset()
             log.info(
                 "There's no record of when we last triggered the build test, "
                 "and the status is not pending, so we are resetting the status."
@@ -338,10 +447,16 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
     # now process PR comments that come after when
     # the bot last did something, first figuring out when the bot last commented
     pr_author = issue.user.login
-    comments = issue.get_comments()
+    # fetch every page of comments once, for both passes below
+    comments = list(issue.get_comments())
+
+    # keep a track of our comments (oldest first) to avoid duplicate messages and spam.
+    bot_comments = []
+
     for comment in comments:
         # loop through once to ascertain when the bot last commented
         if comment.user.login == config.main["bot"]["username"]:
+            bot_comments += [comment.body.strip()]
             if last_time_seen is None or last_time_seen < comment.created_at:
                 not_seen_yet = False
                 last_time_seen = comment.created_at
@@ -352,30 +467,21 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
                 )
     log.info("Last time seen %s", str(last_time_seen))
 
-    bot_comments = (
-        []
-    )  # keep a track of our comments to avoid duplicate messages and spam.
+    # Ignore all messages which are before last commit, and neglect
+    # comments we've already responded to. Comments are listed oldest
+    # first, so walk back from the newest until we reach those.
+    first_new_comment = len(comments)
+    while first_new_comment > 0:
+        created_at = comments[first_new_comment - 1].created_at
+        if created_at < last_commit_date or (
+            last_time_seen is not None and created_at < last_time_seen
+        ):
+            break
+        first_new_comment -= 1
+    log.debug("IGNORE %d COMMENT(S) (before last commit, or seen)", first_new_comment)
 
     # now we process comments
-    for comment in comments:
-        if comment.user.login == config.main["bot"]["username"]:
-            bot_comments += [comment.body.strip()]
-
-        # Ignore all messages which are before last commit.
-        if comment.created_at < last_commit_date:
-            log.debug("IGNORE COMMENT (before last commit)")
-            continue
-
-        # neglect comments we've already responded to
-        if last_time_seen is not None and (comment.created_at < last_time_seen):
-            log.debug(
-                "IGNORE COMMENT (seen) %s %s < %s",
-                comment.user.login,
-                str(comment.created_at),
-                str(last_time_seen),
-            )
-            continue
-
+    for comment in comments[first_new_comment:]:
         # neglect comments by un-authorised users
         if (
             comment.user.login not in authorised_users
@@ -386,13 +492,6 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
             )
             continue
 
-        for react in comment.get_reactions():
-            if react.user.login == config.main["bot"]["username"]:
-                log.debug(
-                    "IGNORE COMMENT (we've seen it and reacted to say we've seen it) - %s",
-                    comment.user.login,
-                )
-
         reaction_t = None
         trigger_search, mentioned = None, None
         # now look for bot triggers
@@ -410,23 +509,22 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
         tests_already_triggered = []
 
         if trigger_search is not None:
+            trigger_comment_handled = True
             tests, _, extra_env = trigger_search
             log.info("Test trigger found!")
             log.debug("Comment: %r", comment.body)
             log.debug("Environment: %s", str(extra_env))
-            log.info("Current test(s): %r" % tests_to_trigger)
+            log.info("Current test(s): %r" % list(tests_to_trigger))
             log.info("Adding these test(s): %r" % tests)
 
             for test in tests:
+                test_state = test_states.setdefault(test, TestState())
                 # check that the test has been triggered on this commit first
                 if (
-                    test in test_triggered
-                    and test_triggered[test]
-                    and test in test_statuses
-                    and not test_statuses[test].strip()
-                    in ["failed", "error", "success", "finished"]
+                    test_state.triggered
+                    and test_state.status.strip() not in TERMINAL_STATES
                 ):
-                    log.debug("Current test status: %s", test_statuses[test])
+                    log.debug("Current test status: %s", test_state.status)
                     log.info(
                         "The test has already been triggered for this ref. "
                         "It will not be triggered again."
@@ -434,22 +532,19 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
                     tests_already_triggered.append(test)
                     reaction_t = "confused"
                     continue
-                else:
-                    test_triggered[test] = False
 
-                if not test_triggered[test]:  # is the test already running?
-                    # ok - now we can trigger the test
-                    log.info(
-                        "The test has not been triggered yet. It will now be triggered."
-                    )
+                # ok - now we can trigger the test
+                log.info(
+                    "The test has not been triggered yet. It will now be triggered."
+                )
 
-                    # update the 'state' of this commit
-                    test_statuses[test] = "pending"
-                    test_triggered[test] = True
+                # update the 'state' of this commit
+                test_state.status = "pending"
+                test_state.triggered = True
 
-                    # add the test to the queue of tests to trigger
-                    tests_to_trigger.append((test, extra_env))
-                    reaction_t = "+1"
+                # add the test to the queue of tests to trigger
+                tests_to_trigger[test] = extra_env
+                reaction_t = "+1"
         elif mentioned:
             # we didn't recognise any commands!
             reaction_t = "confused"
@@ -463,10 +558,9 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
     if trusted_user:
         if not_seen_yet and not dryRun and test_suites.AUTO_TRIGGER_ON_OPEN:
             for test in test_requirements:
-                test_statuses[test] = "pending"
-                test_triggered[test] = True
-                if test not in [t[0] for t in tests_to_trigger]:
-                    tests_to_trigger.append((test, {}))
+                test_states[test].status = "pending"
+                test_states[test].triggered = True
+                tests_to_trigger.setdefault(test, {})
 
     # now,
     # - trigger tests if indicated (for this specific SHA.)
@@ -474,13 +568,16 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
     # - apply labels according to the state of the latest commit of the PR
     # - make a comment if required
     jobs_have_stalled = False
+    # commit statuses to set once every test has been looked at
+    new_statuses = []
+    repo_url = "https://github.com/mu2e/%s" % repo.name
 
-    triggered_tests, extra_envs = list(zip(*tests_to_trigger)) or ([], [])
-    for test, state in test_statuses.items():
+    for test, test_state in test_states.items():
+        state = test_state.status
         if test in legit_tests:
             labels.add(f"{test} {state}")
 
-        if test in triggered_tests:
+        if test in tests_to_trigger:
             log.info("Test will now be triggered! %s", test)
             # trigger the test in jenkins
             create_properties_file_for_test(
@@ -489,54 +586,51 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
                 prId,
                 git_commit.sha,
                 master_commit_sha,
-                extra_envs[triggered_tests.index(test)],
+                tests_to_trigger[test],
             )
-            if not dryRun:
-                if test == "build":
-                    # we need to store somewhere the master commit SHA
-                    # that we merge into for the build test (for validation)
-                    # this is overlapped with the next, more human readable message
-                    last_commit.create_status(
+            if test == "build":
+                # we need to store somewhere the master commit SHA
+                # that we merge into for the build test (for validation)
+                # this is overlapped with the next, more human readable message
+                new_statuses.append(
+                    dict(
                         state="success",
-                        target_url="https://github.com/mu2e/%s" % repo.name,
-                        description="Last test triggered against %s"
-                        % master_commit_sha[:8],
+                        target_url=repo_url,
+                        description=LAST_TEST_DESCRIPTION + master_commit_sha[:8],
                         context="mu2e/buildtest/last",
                     )
+                )
 
-                last_commit.create_status(
-                    state="pending",
-                    target_url="https://github.com/mu2e/%s" % repo.name,
-                    description="The test has been triggered in Jenkins",
+            new_statuses.append(
+                dict(
+                    STATUS_TRIGGERED,
+                    target_url=repo_url,
                     context=test_suites.get_test_alias(test),
                 )
+            )
             log.info(
                 "Git status created for SHA %s test %s - since the test has been triggered.",
                 git_commit.sha,
                 test,
             )
-        elif state == "pending" and test_status_exists[test]:
+        elif state == "pending" and test_state.exists:
             log.info(
                 "Git status unchanged for SHA %s test %s - the existing one is up-to-date.",
                 git_commit.sha,
                 test,
             )
-        elif state == "stalled" and not test_status_exists[test]:
+        elif state == "stalled" and not test_state.exists:
             log.info("Git status was pending, but the job has stalled.")
-            last_commit.create_status(
-                state="error",
-                target_url="https://github.com/mu2e/%s" % repo.name,
-                description="The job has stalled on Jenkins. It can be re-triggered.",
-                context=test_suites.get_test_alias(test),
+            new_statuses.append(
+                dict(
+                    STATUS_STALLED,
+                    target_url=repo_url,
+                    context=test_suites.get_test_alias(test),
+                )
             )
             jobs_have_stalled = True
 
-        elif (
-            state == "pending"
-            and not test_triggered[test]
-            and not test_status_exists[test]
-        ):
-            log.debug(test_status_exists)
+        elif state == "pending" and not test_state.triggered and not test_state.exists:
             log.info(
                 "Git status created for SHA %s test %s - since there wasn't one already."
                 % (git_commit.sha, test)
@@ -544,16 +638,28 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
             labels.add(f"{test} {state}")
             # indicate that the test is pending but
             # we're still waiting for someone to trigger the test
-            if not dryRun:
-                last_commit.create_status(
-                    state="pending",
-                    target_url="https://github.com/mu2e/%s" % repo.name,
-                    description="This test has not been triggered yet.",
+            new_statuses.append(
+                dict(
+                    STATUS_NOT_TRIGGERED,
+                    target_url=repo_url,
                     context=test_suites.get_test_alias(test),
                 )
+            )
         # don't do anything else with commit statuses
         # the script handler that handles Jenkins job results will update the commits accordingly
 
+    if not dryRun:
+        for status in new_statuses:
+            unchanged = current_statuses.get(status["context"]) == (
+                status["state"],
+                status["description"],
+                status["target_url"],
+            )
+            if unchanged and status["description"] != TRIGGERED_DESCRIPTION:
+                log.info("Git status for %s is already up-to-date.", status["context"])
+                continue
+            last_commit.create_status(**status)
+
     # check if labels have changed
     labelnames = {x.name for x in issue.labels if "unrecognised" not in x.name}
     if labelnames != labels:
@@ -563,13 +669,7 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
 
     # check label colours
     try:
-        for label in issue.labels:
-            if label.color == "ededed":
-                # the label color isn't set
-                for labelcontent, col in state_labels_colors.items():
-                    if labelcontent in label.name:
-                        label.edit(label.name, col)
-                        break
+        ensure_label_colours(repo, issue.labels, LABEL_COLOUR_RULES)
     except Exception:
         log.exception("Failed to set label colours!")
 
@@ -586,11 +686,16 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
 
         tests_triggered_msg = TESTS_TRIGGERED_CONFIRMATION.format(
             commit_link=commitlink,
-            test_list=", ".join(list(zip(*tests_to_trigger))[0]),
+            test_list=", ".join(tests_to_trigger),
             tests_already_running_msg=already_running_msg,
-            build_queue_str=get_build_queue_size(),
+            build_queue_str=get_build_queue_size() if not dryRun else "n/a",
         )
 
+    if trigger_comment_handled:
+        # a new trigger comment always gets a reply, even if it's the same as
+        # the bot's last comment (e.g. after re-triggering a failed test)
+        bot_comments = []
+
     # decide if we should issue a comment, and what comment to issue
     if not_seen_yet:
         log.info("First time seeing this PR - send the user a salutation!")
@@ -600,11 +705,11 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
                 PR_SALUTATION.format(
                     pr_author=pr_author,
                     changed_folders="\n".join(
-                        ["- %s" % s for s in modified_top_level_folders]
+                        "- %s" % s for s in modified_top_level_folders
                     ),
                     tests_required=", ".join(test_requirements),
                     watchers=watcher_text,
-                    auth_teams=", ".join(["@Mu2e/%s" % team for team in authed_teams]),
+                    auth_teams=", ".join("@Mu2e/%s" % team for team in authed_teams),
                     tests_triggered_msg=tests_triggered_msg,
                     non_member_msg="" if trusted_user else PR_AUTHOR_NONMEMBER,
                     base_branch=pr.base.ref,
@@ -644,8 +749,8 @@ def process_pr(gh, repo, issue, dryRun=False, child_call=0):
             ),
             bot_comments,
         )
-    if "build" in test_status_exists:
-        if future_commit and not test_status_exists["build"] and not dryRun:
+    if "build" in test_states:
+        if future_commit and not test_states["build"].exists and not dryRun:
             post_on_pr(
                 issue,
                 f":memo: The latest commit by @{git_commit.committer.name} is "
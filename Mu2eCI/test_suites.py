@@ -1,4 +1,5 @@
 import re
+import functools
 from Mu2eCI import config
 from Mu2eCI.logger import log
 
@@ -55,6 +56,8 @@ TEST_REGEXP_CUSTOM_TEST_TRIGGER = (
 )
 REGEX_CUSTOM_TEST_MU2E_PR = re.compile(TEST_REGEXP_CUSTOM_TEST_TRIGGER, re.I | re.M)
 
+# every trigger regex above starts with this - check_test_cmd_mu2e
+# relies on it to skip comments that don't mention the bot
 TEST_MENTIONED = r"(@%s)(\s*[,:;]*\s+|\s+)" % MU2E_BOT_USER
 regex_mentioned = re.compile(TEST_MENTIONED, re.I | re.M)
 
@@ -73,7 +76,13 @@ TEST_ALIASES = {
     "validation": ["mu2e/validation"],
 }
 
+# seconds a running test may go without an update before it is considered
+# stalled. tests usually return results within an hour
+DEFAULT_STALL_TIME = 3600
+STALL_TIMES = {test: DEFAULT_STALL_TIME for test in SUPPORTED_TESTS}
 
+
+@functools.lru_cache(maxsize=None)
 def get_test_name(alias):
     for k, vals in TEST_ALIASES.items():
         if alias.lower() in vals or alias.lower() == k:
@@ -81,6 +90,7 @@ def get_test_name(alias):
     return "unrecognised"
 
 
+@functools.lru_cache(maxsize=None)
 def get_test_alias(test):
     if test not in TEST_ALIASES:
         return "mu2e/unrecognised"
@@ -107,7 +117,7 @@ def get_tests_for(monorepo_packages):
 
 
 def get_stall_time(name):
-    return 3600  # tests usually return results within an hour
+    return STALL_TIMES.get(name, DEFAULT_STALL_TIME)
 
 
 def build_test_configuration(matched_re):